@@ -4,6 +4,7 @@ Assertions about requests/data received on the fake backend
 import os
 import re
 import socket
+import time
 import urllib.request
 from base64 import b64encode
 from http.client import HTTPException
@@ -195,6 +196,28 @@ def tcp_socket_open(host, port):
         return False
 
 
+def tcp_wait_open(host, port, timeout=30):
+    """
+    Returns True once a TCP connection to the given host/port succeeds, or
+    False if that doesn't happen within `timeout` seconds.  Each attempt blocks
+    for up to the remaining time, and refused connections are retried with an
+    exponential backoff.
+    """
+    deadline = time.time() + timeout
+    delay = 0.1
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        try:
+            socket.create_connection((host, port), timeout=remaining).close()
+            return True
+        except OSError:
+            pass
+        time.sleep(max(0, min(delay, deadline - time.time())))
+        delay = min(delay * 2, 2)
+
+
 def http_status(url=None, status=None, username=None, password=None, timeout=1, **kwargs):
     """
     Wrapper around urllib.request.urlopen() that returns True if
@@ -0,0 +1,62 @@
+"""
+YAML parsing/serialization helpers that use PyYAML's libyaml bindings when available
+"""
+import copy
+import functools
+import os
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
+
+def load(stream):
+    """
+    Parses the first YAML document in `stream` (str, bytes, or file object)
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def load_all(stream):
+    """
+    Returns a generator of all YAML documents in `stream` (str, bytes, or file
+    object)
+    """
+    return yaml.load_all(stream, Loader=SafeLoader)
+
+
+def dump(data, stream=None, **kwargs):
+    """
+    Serializes `data` as YAML in block style, returning it as a str if
+    `stream` is None
+    """
+    kwargs.setdefault("default_flow_style", False)
+    return yaml.dump(data, stream, Dumper=SafeDumper, **kwargs)
+
+
+@functools.lru_cache(maxsize=64)
+def _load_file_cached(path, mtime):  # pylint: disable=unused-argument
+    # libyaml reads straight from the file object, so there's no need to
+    # read the whole file into a str first
+    with open(path, "rb") as fd:
+        return list(load_all(fd))
+
+
+def load_file_all(path):
+    """
+    Returns a list of all YAML documents in the file at `path`.  Parsed files
+    are cached until their mtime changes, and a deep copy is returned so that
+    callers are free to mutate the result.
+    """
+    return copy.deepcopy(_load_file_cached(path, os.path.getmtime(path)))
+
+
+def load_file(path):
+    """
+    Returns the first YAML document in the file at `path` (see load_file_all)
+    """
+    docs = _load_file_cached(path, os.path.getmtime(path))
+    return copy.deepcopy(docs[0]) if docs else None
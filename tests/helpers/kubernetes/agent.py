@@ -1,7 +1,7 @@
 import time
 from functools import partial as p
 
-import yaml
+from tests.helpers import fastyaml
 from tests.helpers.kubernetes.utils import (
     create_clusterrole,
     create_clusterrolebinding,
@@ -20,6 +20,7 @@ from tests.helpers.kubernetes.utils import (
     has_pod,
     has_secret,
     has_serviceaccount,
+    wait_for_pods_ready_by_labels,
 )
 from tests.helpers.util import get_internal_status_host, wait_for
 
@@ -66,26 +67,29 @@ class Agent:  # pylint: disable=too-many-instance-attributes
             create_secret("signalfx-agent", "access-token", secret, namespace=self.namespace)
 
     def create_agent_serviceaccount(self, serviceaccount_path):
-        self.serviceaccount_yaml = yaml.load(open(serviceaccount_path).read())
+        self.serviceaccount_yaml = fastyaml.load_file(serviceaccount_path)
         self.serviceaccount_name = self.serviceaccount_yaml["metadata"]["name"]
         if not has_serviceaccount(self.serviceaccount_name, namespace=self.namespace):
             print('Creating service account "%s" from %s ...' % (self.serviceaccount_name, serviceaccount_path))
             create_serviceaccount(body=self.serviceaccount_yaml, namespace=self.namespace)
 
     def create_agent_clusterrole(self, clusterrole_path, clusterrolebinding_path):
-        self.clusterrole_yaml = yaml.load(open(clusterrole_path).read())
-        self.clusterrole_name = self.clusterrole_yaml["metadata"]["name"]
-        self.clusterrolebinding_yaml = yaml.load(open(clusterrolebinding_path).read())
-        self.clusterrolebinding_name = self.clusterrolebinding_yaml["metadata"]["name"]
-        if self.namespace != "default":
-            self.clusterrole_name = self.clusterrole_name + "-" + self.namespace
-            self.clusterrole_yaml["metadata"]["name"] = self.clusterrole_name
-            self.clusterrolebinding_name = self.clusterrolebinding_name + "-" + self.namespace
-            self.clusterrolebinding_yaml["metadata"]["name"] = self.clusterrolebinding_name
-        if self.clusterrolebinding_yaml["roleRef"]["kind"] == "ClusterRole":
-            self.clusterrolebinding_yaml["roleRef"]["name"] = self.clusterrole_name
-        for subject in self.clusterrolebinding_yaml["subjects"]:
-            subject["namespace"] = self.namespace
+        ns = self.namespace
+        self.clusterrole_yaml = fastyaml.load_file(clusterrole_path)
+        self.clusterrolebinding_yaml = fastyaml.load_file(clusterrolebinding_path)
+        crb = self.clusterrolebinding_yaml
+        cr_meta = self.clusterrole_yaml["metadata"]
+        crb_meta = crb["metadata"]
+        if ns != "default":
+            cr_meta["name"] += "-" + ns
+            crb_meta["name"] += "-" + ns
+        self.clusterrole_name = cr_meta["name"]
+        self.clusterrolebinding_name = crb_meta["name"]
+        role_ref = crb["roleRef"]
+        if role_ref["kind"] == "ClusterRole":
+            role_ref["name"] = self.clusterrole_name
+        for subject in crb["subjects"]:
+            subject["namespace"] = ns
         if not has_clusterrole(self.clusterrole_name):
             print('Creating cluster role "%s" from %s ...' % (self.clusterrole_name, clusterrole_path))
             create_clusterrole(self.clusterrole_yaml)
@@ -97,10 +101,10 @@ class Agent:  # pylint: disable=too-many-instance-attributes
             create_clusterrolebinding(self.clusterrolebinding_yaml)
 
     def create_agent_configmap(self, configmap_path):
-        self.configmap_yaml = yaml.load(open(configmap_path).read())
+        self.configmap_yaml = fastyaml.load_file(configmap_path)
         self.configmap_name = self.configmap_yaml["metadata"]["name"]
         self.delete_agent_configmap()
-        self.agent_yaml = yaml.load(self.configmap_yaml["data"]["agent.yaml"])
+        self.agent_yaml = fastyaml.load(self.configmap_yaml["data"]["agent.yaml"])
         del self.agent_yaml["observers"]
         if not self.observer and "observers" in self.agent_yaml.keys():
             del self.agent_yaml["observers"]
@@ -128,7 +132,7 @@ class Agent:  # pylint: disable=too-many-instance-attributes
             del self.agent_yaml["metricsToExclude"]
         del self.agent_yaml["monitors"]
         self.agent_yaml["monitors"] = self.monitors
-        self.configmap_yaml["data"]["agent.yaml"] = yaml.dump(self.agent_yaml)
+        self.configmap_yaml["data"]["agent.yaml"] = fastyaml.dump(self.agent_yaml)
         print(
             "Creating configmap for observer=%s and monitor(s)=%s from %s ..."
             % (self.observer, ",".join([m["type"] for m in self.monitors]), configmap_path)
@@ -136,7 +140,7 @@ class Agent:  # pylint: disable=too-many-instance-attributes
         create_configmap(body=self.configmap_yaml, namespace=self.namespace)
 
     def create_agent_daemonset(self, daemonset_path):
-        self.daemonset_yaml = yaml.load(open(daemonset_path).read())
+        self.daemonset_yaml = fastyaml.load_file(daemonset_path)
         self.daemonset_name = self.daemonset_yaml["metadata"]["name"]
         self.delete_agent_daemonset()
         self.container_name = self.daemonset_yaml["spec"]["template"]["spec"]["containers"][0]["name"]
@@ -151,10 +155,19 @@ class Agent:  # pylint: disable=too-many-instance-attributes
             )
         else:
             print('Creating daemonset "%s" from %s ...' % (self.daemonset_name, daemonset_path))
-        create_daemonset(body=self.daemonset_yaml, namespace=self.namespace)
-        assert wait_for(p(has_pod, self.daemonset_name, namespace=self.namespace), timeout_seconds=60), (
-            "timed out waiting for the %s pod to be created!" % self.daemonset_name
+        daemonset = create_daemonset(body=self.daemonset_yaml, namespace=self.namespace)
+        # The daemonset only counts its own ready pods, so also make sure that
+        # no terminating pods from a previous agent deployment are still around
+        # before get_container() expects to find a single agent pod
+        label_selector = ",".join(
+            "%s=%s" % (key, value) for key, value in self.daemonset_yaml["spec"]["selector"]["matchLabels"].items()
         )
+        assert wait_for_pods_ready_by_labels(
+            label_selector,
+            namespace=self.namespace,
+            expected_count=daemonset.status.desired_number_scheduled,
+            timeout=60,
+        ), ("timed out waiting for the %s pod(s) to be ready!" % self.daemonset_name)
 
     def deploy(
         self,
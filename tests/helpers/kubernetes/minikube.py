@@ -1,24 +1,27 @@
 import os
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from functools import partial as p
 
 import docker
 import semver
-import yaml
 from kubernetes import config as kube_config
 
-from tests.helpers.assertions import container_cmd_exit_0
+from tests.helpers import fastyaml
+from tests.helpers.assertions import container_cmd_exit_0, tcp_wait_open
 from tests.helpers.kubernetes.agent import Agent
 from tests.helpers.kubernetes.utils import (
     api_client_from_version,
     container_is_running,
+    create_namespace,
     create_resource,
     delete_resource,
     get_all_logs,
     get_free_port,
     has_docker_image,
+    has_namespace,
     has_resource,
     wait_for_deployment,
 )
@@ -28,6 +31,50 @@ MINIKUBE_VERSION = os.environ.get("MINIKUBE_VERSION")
 MINIKUBE_LOCALKUBE_VERSION = "v0.28.2"
 MINIKUBE_KUBEADM_VERSION = "v0.30.0"
 TEST_SERVICES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../../test-services")
+# Resource kinds that other resources may depend on, which are created before
+# everything else in deploy_k8s_yamls
+K8S_PREREQ_KINDS = {
+    "Namespace",
+    "CustomResourceDefinition",
+    "ConfigMap",
+    "Secret",
+    "ServiceAccount",
+    "ClusterRole",
+    "ClusterRoleBinding",
+    "PersistentVolumeClaim",
+}
+
+
+def split_k8s_yamls(yamls, namespace):
+    """
+    Loads the K8S resources from the `yamls` files, defaulting their namespace
+    to `namespace`, and returns them as two lists of (yaml_file, doc) tuples:
+    the resources with kinds in K8S_PREREQ_KINDS and everything else.
+    """
+    prereqs = []
+    workloads = []
+    for yaml_file in yamls:
+        assert os.path.isfile(yaml_file), '"%s" not found!' % yaml_file
+        for doc in fastyaml.load_file_all(yaml_file):
+            if not doc.get("metadata", {}).get("namespace"):
+                if "metadata" not in doc:
+                    doc["metadata"] = {}
+                doc["metadata"]["namespace"] = namespace
+            if doc["kind"] in K8S_PREREQ_KINDS:
+                prereqs.append((yaml_file, doc))
+            else:
+                workloads.append((yaml_file, doc))
+    return prereqs, workloads
+
+
+def create_missing_namespaces(docs):
+    """
+    Creates the namespaces of the K8S resources in `docs` that don't exist yet,
+    so that concurrent create_resource calls don't race to create them
+    """
+    for namespace in {doc["metadata"]["namespace"] for doc in docs}:
+        if namespace and not has_namespace(namespace):
+            create_namespace(namespace)
 
 
 class Minikube:  # pylint: disable=too-many-instance-attributes
@@ -35,6 +82,8 @@ class Minikube:  # pylint: disable=too-many-instance-attributes
         self.bootstrapper = None
         self.container = None
         self.client = None
+        self.client_base_url = None
+        self.docker_api_version = None
         self.version = None
         self.k8s_version = None
         self.name = None
@@ -50,17 +99,33 @@ class Minikube:  # pylint: disable=too-many-instance-attributes
     def get_client(self):
         if self.container:
             self.container.reload()
-            self.client = docker.DockerClient(base_url="tcp://%s:2375" % container_ip(self.container), version="auto")
+            ip_addr = container_ip(self.container)
+            base_url = "tcp://%s:2375" % ip_addr
+            if self.client and self.client_base_url == base_url:
+                return self.client
+            assert tcp_wait_open(ip_addr, 2375, timeout=60), "timed out waiting for docker in minikube!"
+            # Only negotiate the API version with the docker daemon in minikube
+            # once since it requires an extra round-trip
+            self.client = docker.DockerClient(base_url=base_url, version=self.docker_api_version or "auto")
+            self.client_base_url = base_url
+            self.docker_api_version = self.client.api.api_version
 
         return self.client
 
     def load_kubeconfig(self, kubeconfig_path="/kubeconfig", timeout=300):
         with tempfile.NamedTemporaryFile(dir="/tmp/scratch") as fd:
             kubeconfig = fd.name
+            # Let the shell in the container wait for the kubeconfig instead of
+            # issuing a separate exec every couple of seconds, but only for up
+            # to 45 seconds per exec to stay under the docker client's 60 second
+            # read timeout
+            wait_script = "i=0; while [ ! -f %s ]; do [ $i -ge 45 ] && exit 1; i=$((i+1)); sleep 1; done" % (
+                kubeconfig_path
+            )
             assert wait_for(
-                p(container_cmd_exit_0, self.container, "test -f %s" % kubeconfig_path),
+                p(container_cmd_exit_0, self.container, ["sh", "-c", wait_script]),
                 timeout_seconds=timeout,
-                interval_seconds=2,
+                interval_seconds=1,
             ), ("timed out waiting for the minikube cluster to be ready!\n\n%s\n\n" % self.get_logs())
             time.sleep(2)
             exit_code, output = self.container.exec_run("cp -f %s %s" % (kubeconfig_path, kubeconfig))
@@ -69,13 +134,9 @@ class Minikube:  # pylint: disable=too-many-instance-attributes
             kube_config.load_kube_config(config_file=self.kubeconfig)
 
     def get_bootstrapper(self):
-        code, _ = self.container.exec_run("which localkube")
+        code, output = self.container.exec_run(["sh", "-c", "command -v localkube || command -v kubeadm"])
         if code == 0:
-            self.bootstrapper = "localkube"
-        else:
-            code, _ = self.container.exec_run("which kubeadm")
-            if code == 0:
-                self.bootstrapper = "kubeadm"
+            self.bootstrapper = os.path.basename(output.decode("utf-8").strip())
         return self.bootstrapper
 
     def connect(self, name, timeout, version=None):
@@ -164,30 +225,46 @@ class Minikube:  # pylint: disable=too-many-instance-attributes
         if yamls is None:
             yamls = []
         self.yamls = []
-        for yaml_file in yamls:
-            assert os.path.isfile(yaml_file), '"%s" not found!' % yaml_file
-            docs = []
-            with open(yaml_file, "r") as fd:
-                docs = yaml.load_all(fd.read())
-
-            for doc in docs:
-                kind = doc["kind"]
-                name = doc["metadata"]["name"]
-                api_version = doc["apiVersion"]
-                api_client = api_client_from_version(api_version)
-
-                if not doc.get("metadata", {}).get("namespace"):
-                    if "metadata" not in doc:
-                        doc["metadata"] = {}
-                    doc["metadata"]["namespace"] = namespace
-
-                if has_resource(name, kind, api_client, namespace):
-                    print('Deleting %s "%s" ...' % (kind, name))
-                    delete_resource(name, kind, api_client, namespace=namespace)
-
-                print("Creating %s from %s ..." % (kind, yaml_file))
-                create_resource(doc, api_client, namespace=namespace, timeout=timeout)
-                self.yamls.append(doc)
+        prereqs, workloads = split_k8s_yamls(yamls, namespace)
+
+        # Share one API client per API version between the create and delete
+        # passes rather than constructing a new one for every document
+        api_clients = {
+            api_version: api_client_from_version(api_version)
+            for api_version in {doc["apiVersion"] for _, doc in prereqs + workloads}
+        }
+
+        def create_one(yaml_file_and_doc):
+            yaml_file, doc = yaml_file_and_doc
+            kind = doc["kind"]
+            name = doc["metadata"]["name"]
+            api_client = api_clients[doc["apiVersion"]]
+
+            if has_resource(name, kind, api_client, namespace):
+                print('Deleting %s "%s" ...' % (kind, name))
+                delete_resource(name, kind, api_client, namespace=namespace)
+
+            print("Creating %s from %s ..." % (kind, yaml_file))
+            create_resource(doc, api_client, namespace=namespace, timeout=timeout)
+            return doc
+
+        def delete_one(doc):
+            kind = doc["kind"]
+            name = doc["metadata"]["name"]
+            print('Deleting %s "%s" ...' % (kind, name))
+            try:
+                delete_resource(name, kind, api_clients[doc["apiVersion"]], namespace=namespace)
+            except Exception as e:  # pylint: disable=broad-except
+                print('Failed to delete %s "%s"!\n%s' % (kind, name, str(e)))
+
+        create_missing_namespaces([doc for _, doc in prereqs + workloads])
+
+        # Resources within each phase are independent of each other, so create
+        # them concurrently, but make sure the prerequisites exist before any
+        # workloads that reference them
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for phase in (prereqs, workloads):
+                self.yamls.extend(executor.map(create_one, phase))
 
         for doc in filter(lambda d: d["kind"] == "Deployment", self.yamls):
             print("Waiting for deployment %s to be ready ..." % doc["metadata"]["name"])
@@ -196,13 +273,12 @@ class Minikube:  # pylint: disable=too-many-instance-attributes
         try:
             yield
         finally:
-            for res in self.yamls:
-                print('Deleting %s "%s" ...' % (kind, name))
-                kind = res["kind"]
-                api_version = res["apiVersion"]
-                api_client = api_client_from_version(api_version)
-                delete_resource(name, kind, api_client, namespace=namespace)
-            self.yamls = []
+            try:
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    for phase in (workloads, prereqs):
+                        list(executor.map(delete_one, [doc for _, doc in phase]))
+            finally:
+                self.yamls = []
 
     def pull_agent_image(self, name, tag, image_id=None):
         if image_id and has_docker_image(self.client, image_id):
@@ -7,8 +7,10 @@ from functools import partial as p
 import docker
 import yaml
 from kubernetes import client as kube_client
+from kubernetes import watch as kube_watch
 from kubernetes.client.rest import ApiException
 
+from tests.helpers import fastyaml
 from tests.helpers.assertions import has_any_metric_or_dim
 from tests.helpers.formatting import print_dp_or_event
 from tests.helpers.util import container_ip, fake_backend, get_host_ip, get_observer_dims_from_selfdescribe, wait_for
@@ -272,13 +274,30 @@ def create_clusterrolebinding(body, timeout=K8S_CREATE_TIMEOUT):
     return clusterrolebinding
 
 
+def watch_until(api_call, predicate, timeout, *args, **kwargs):
+    """
+    Streams watch events from the K8S list function `api_call` (called with
+    `args` and `kwargs`) and returns the first object in an ADDED or MODIFIED
+    event for which `predicate` returns True, or None if `timeout` seconds
+    elapse first.
+    """
+    watcher = kube_watch.Watch()
+    try:
+        for event in watcher.stream(api_call, *args, timeout_seconds=int(timeout), **kwargs):
+            if event["type"] in ("ADDED", "MODIFIED") and predicate(event["object"]):
+                return event["object"]
+    finally:
+        watcher.stop()
+    return None
+
+
 def api_client_from_version(api_version):
     return {
-        "v1": kube_client.CoreV1Api(),
-        "extensions/v1beta1": kube_client.ExtensionsV1beta1Api(),
-        "rbac.authorization.k8s.io/v1beta1": kube_client.RbacAuthorizationV1beta1Api(),
-        "rbac.authorization.k8s.io/v1": kube_client.RbacAuthorizationV1Api(),
-    }[api_version]
+        "v1": kube_client.CoreV1Api,
+        "extensions/v1beta1": kube_client.ExtensionsV1beta1Api,
+        "rbac.authorization.k8s.io/v1beta1": kube_client.RbacAuthorizationV1beta1Api,
+        "rbac.authorization.k8s.io/v1": kube_client.RbacAuthorizationV1Api,
+    }[api_version]()
 
 
 def camel_case_to_snake_case(name):
@@ -373,15 +392,6 @@ def has_deployment(name, namespace="default"):
         raise
 
 
-def deployment_is_ready(name, replicas, namespace="default"):
-    api = kube_client.ExtensionsV1beta1Api()
-    if not has_deployment(name, namespace=namespace):
-        return False
-    if api.read_namespaced_deployment_status(name, namespace=namespace).status.ready_replicas == replicas:
-        return True
-    return False
-
-
 def wait_for_deployment(deployment, timeout):
     """
     Waits for all pods in a deployment to be ready
@@ -390,8 +400,13 @@ def wait_for_deployment(deployment, timeout):
     replicas = deployment["spec"]["replicas"]
     namespace = deployment["metadata"]["namespace"]
 
-    assert wait_for(
-        p(deployment_is_ready, name, replicas, namespace=namespace), timeout_seconds=timeout, interval_seconds=2
+    api = kube_client.ExtensionsV1beta1Api()
+    assert watch_until(
+        api.list_namespaced_deployment,
+        lambda d: d.status.ready_replicas == replicas,
+        timeout,
+        namespace,
+        field_selector="metadata.name=%s" % name,
     ), 'timed out waiting for deployment "%s" to be ready!\n%s' % (name, get_pod_logs(name, namespace=namespace))
 
 
@@ -420,15 +435,6 @@ def has_daemonset(name, namespace="default"):
         raise
 
 
-def daemonset_is_ready(name, namespace="default"):
-    api = kube_client.ExtensionsV1beta1Api()
-    if not has_daemonset(name, namespace=namespace):
-        return False
-    if api.read_namespaced_daemon_set_status(name, namespace=namespace).status.number_ready > 0:
-        return True
-    return False
-
-
 def create_daemonset(body, namespace=None, timeout=K8S_CREATE_TIMEOUT):
     api = kube_client.ExtensionsV1beta1Api()
     name = body["metadata"]["name"]
@@ -442,10 +448,15 @@ def create_daemonset(body, namespace=None, timeout=K8S_CREATE_TIMEOUT):
             namespace = "default"
     if not has_namespace(namespace):
         create_namespace(namespace)
-    daemonset = api.create_namespaced_daemon_set(body=body, namespace=namespace)
-    assert wait_for(p(daemonset_is_ready, name, namespace=namespace), timeout_seconds=timeout), (
-        'timed out waiting for daemonset "%s" to be ready!' % name
+    api.create_namespaced_daemon_set(body=body, namespace=namespace)
+    daemonset = watch_until(
+        api.list_namespaced_daemon_set,
+        lambda d: d.status.desired_number_scheduled and d.status.number_ready == d.status.desired_number_scheduled,
+        timeout,
+        namespace,
+        field_selector="metadata.name=%s" % name,
     )
+    assert daemonset, 'timed out waiting for daemonset "%s" to be ready!' % name
     return daemonset
 
 
@@ -483,6 +494,60 @@ def get_pod_logs(name, namespace="default"):
     return api.read_namespaced_pod_log(name=pods[0].metadata.name, namespace=namespace)
 
 
+def pod_is_ready(pod):
+    """
+    Returns True if the pod's "Ready" condition is "True"
+    """
+    for condition in pod.status.conditions or []:
+        if condition.type == "Ready":
+            return condition.status == "True"
+    return False
+
+
+def wait_for_pods_ready_by_labels(label_selector, namespace="default", expected_count=1, timeout=K8S_CREATE_TIMEOUT):
+    """
+    Watches the pods matching `label_selector` within `namespace` over a single
+    streaming connection instead of polling each pod.
+
+    Returns True once exactly `expected_count` pods match, all of them are
+    ready, and none of them are terminating (e.g. left over from a previous
+    deployment with the same labels), or False if `timeout` seconds elapse
+    first.
+    """
+    api = kube_client.CoreV1Api()
+
+    def pod_is_settled(pod):
+        return pod_is_ready(pod) and not pod.metadata.deletion_timestamp
+
+    # Seed the current state from a list call and only watch for changes after
+    # it, since the initial ADDED events of a watch arrive in arbitrary order
+    pods = api.list_namespaced_pod(namespace, label_selector=label_selector)
+    ready = {pod.metadata.name: pod_is_settled(pod) for pod in pods.items}
+    if len(ready) == expected_count and all(ready.values()):
+        return True
+    watcher = kube_watch.Watch()
+    try:
+        for event in watcher.stream(
+            api.list_namespaced_pod,
+            namespace,
+            label_selector=label_selector,
+            resource_version=pods.metadata.resource_version,
+            timeout_seconds=int(timeout),
+        ):
+            if event["type"] == "ERROR":
+                continue
+            pod = event["object"]
+            if event["type"] == "DELETED":
+                ready.pop(pod.metadata.name, None)
+            else:
+                ready[pod.metadata.name] = pod_is_settled(pod)
+            if len(ready) == expected_count and all(ready.values()):
+                return True
+    finally:
+        watcher.stop()
+    return False
+
+
 def get_all_pods(namespace=None):
     """
     Args:
@@ -660,8 +725,8 @@ def get_discovery_rule(yaml_file, observer, namespace="", container_index=0):
     image = None
     ports = []
     labels = []
-    with open(yaml_file, "r") as fd:
-        for doc in yaml.load_all(fd.read()):
+    with open(yaml_file, "rb") as fd:
+        for doc in fastyaml.load_all(fd):
             if doc["kind"] == "Deployment":
                 container = doc["spec"]["template"]["spec"]["containers"][container_index]
                 name = container["name"]
@@ -11,9 +11,8 @@ pytestmark = [pytest.mark.windows, pytest.mark.diskio, pytest.mark.monitor_witho
 
 def test_diskio():
     # TODO: make the helper that fetches metrics from selfdescribe.json check for platform specificity
-    expected_metrics = []
     if sys.platform == "linux":
-        expected_metrics.extend(
+        expected_metrics = frozenset(
             [
                 "disk_merged.read",
                 "disk_merged.write",
@@ -26,7 +25,7 @@ def test_diskio():
             ]
         )
     elif sys.platform == "win32" or sys.platform == "cygwin":
-        expected_metrics.extend(
+        expected_metrics = frozenset(
             [
                 "disk_ops.avg_read",
                 "disk_ops.avg_write",
@@ -36,6 +35,8 @@ def test_diskio():
                 "disk_time.avg_write",
             ]
         )
+    else:
+        expected_metrics = frozenset()
     expected_dims = get_monitor_dims_from_selfdescribe("disk-io")
     with run_agent(
         """